@@ -1,17 +1,125 @@
 """
 Import cleaned financial data to Supabase
 """
+import asyncio
+import csv
+import asyncpg
 import pandas as pd
-from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 # Load environment variables
 load_dotenv()
 
-def import_data():
-    """Import CSV data to Supabase"""
+TABLE_NAME = "texas_school_finance"
+COPY_WORKERS = 8  # Concurrent COPY connections (one backend each)
+COPY_BATCH_ROWS = 100_000  # Rows converted to Python records at a time
+
+# Materialized views built on TABLE_NAME, in dependency order
+MATERIALIZED_VIEWS = ("v_finance_summary", "v_finance_yoy", "v_anomaly_flags")
+
+class FileSlice:
+    """Read-only view of a byte range of an open file, counting rows as they pass"""
+    
+    def __init__(self, f, start, end):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+        self.rows = 0
+    
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        self.rows += data.count(b"\n")
+        return data
+
+def partition_by_district(df, n_partitions=COPY_WORKERS):
+    """Split rows into partitions by a hash of district_number"""
+    keys = pd.util.hash_pandas_object(df["district_number"], index=False) % n_partitions
+    return [part for _, part in df.groupby(keys.values, sort=False)]
+
+def iter_records(df, batch_rows=COPY_BATCH_ROWS):
+    """Yield rows as plain tuples with missing values as None, one batch at a time"""
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows].astype(object)
+        batch = batch.where(batch.notna(), None)
+        yield from batch.itertuples(index=False, name=None)
+
+async def copy_partition(pool, df):
+    """COPY one DataFrame partition on its own pooled connection"""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL synchronous_commit = off")
+            await conn.copy_records_to_table(
+                TABLE_NAME,
+                records=iter_records(df),
+                columns=list(df.columns)
+            )
+    return len(df)
+
+async def copy_frame(pool, df):
+    """COPY a DataFrame concurrently, one connection per district partition"""
+    counts = await asyncio.gather(
+        *(copy_partition(pool, part) for part in partition_by_district(df))
+    )
+    return sum(counts)
+
+async def refresh_views(pool):
+    """Rebuild the read-side views; CONCURRENTLY keeps them readable meanwhile"""
+    for view in MATERIALIZED_VIEWS:
+        await pool.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+
+def read_csv_header(csv_path):
+    """Return the column names from the CSV header row"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
+
+def split_csv(csv_path, n_slices=COPY_WORKERS):
+    """
+    Split the CSV body (everything after the header) into byte ranges
+    that each start and end on a line break
+    
+    Assumes no quoted field spans multiple lines; prepare_data.py replaces
+    line breaks inside text cells with spaces to guarantee this.
+    """
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as f:
+        f.readline()  # Skip header
+        bounds = [f.tell()]
+        step = max(1, (size - bounds[0]) // n_slices)
+        for i in range(1, n_slices):
+            f.seek(max(bounds[0] + i * step, bounds[-1]))
+            f.readline()
+            bounds.append(f.tell())
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+async def copy_csv_slice(pool, csv_path, columns, start, end):
+    """COPY one byte range of the CSV on its own pooled connection"""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL synchronous_commit = off")
+            with open(csv_path, "rb") as f:
+                body = FileSlice(f, start, end)
+                await conn.copy_to_table(
+                    TABLE_NAME,
+                    source=body,
+                    columns=columns,
+                    format="csv",
+                    null=""
+                )
+    return body.rows
+
+async def import_data():
+    """Import cleaned data to Supabase"""
     print("=" * 60)
     print("Texas ISD Financial Data Import")
     print("=" * 60)
@@ -23,41 +131,58 @@ def import_data():
     
     print(f"\n✓ Database URL loaded")
     
-    # Create engine
-    print("✓ Creating database connection...")
-    engine = create_engine(db_url)
-    
-    # Load CSV
+    # Prefer the typed Parquet output; fall back to streaming the CSV as-is
+    parquet_path = Path("data/texas_finance_clean.parquet")
     csv_path = Path("data/texas_finance_clean.csv")
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV file not found: {csv_path}")
-    
-    print(f"✓ Loading data from {csv_path}...")
-    df = pd.read_csv(csv_path)
+    if parquet_path.exists():
+        print(f"✓ Loading data from {parquet_path}...")
+        df = pd.read_parquet(parquet_path)
+        columns = list(df.columns)
+        print(f"✓ Loaded {len(df):,} records with {len(columns)} columns")
+    elif csv_path.exists():
+        df = None
+        columns = read_csv_header(csv_path)
+        slices = split_csv(csv_path)
+        print(f"✓ Streaming {csv_path} ({len(columns)} columns, {len(slices)} slices)")
+    else:
+        raise FileNotFoundError(f"No cleaned data found: {parquet_path} or {csv_path}")
     
-    print(f"✓ Loaded {len(df):,} records with {len(df.columns)} columns")
+    # Connect
+    print(f"✓ Creating connection pool ({COPY_WORKERS} connections)...")
+    pool = await asyncpg.create_pool(db_url, min_size=1, max_size=COPY_WORKERS)
     
     # Import to database
     print("\n⏳ Importing data to Supabase...")
-    print("   This may take 2-3 minutes...")
     
-    df.to_sql(
-        "texas_school_finance",
-        engine,
-        if_exists="append",
-        index=False,
-        chunksize=1000,
-        method="multi"
-    )
+    # COPY each partition concurrently, one connection per partition
+    try:
+        if df is not None:
+            total_records = await copy_frame(pool, df)
+        else:
+            total_records = sum(await asyncio.gather(*(
+                copy_csv_slice(pool, csv_path, columns, start, end)
+                for start, end in slices
+            )))
+        
+        print("⏳ Refreshing materialized views...")
+        await refresh_views(pool)
+        
+        # Summarize from the database rather than re-reading the data
+        start_year, end_year, districts = await pool.fetchrow(f"""
+            SELECT MIN(year), MAX(year), COUNT(DISTINCT district_number)
+            FROM {TABLE_NAME}
+        """)
+    finally:
+        await pool.close()
     
     print("\n" + "=" * 60)
     print("✅ SUCCESS! Data imported successfully!")
     print("=" * 60)
     print(f"\n📊 Import Summary:")
-    print(f"   • Total records: {len(df):,}")
-    print(f"   • Total columns: {len(df.columns)}")
-    print(f"   • Year range: {df['year'].min()} - {df['year'].max()}")
-    print(f"   • Districts: {df['district_number'].nunique():,}")
+    print(f"   • Total records: {total_records:,}")
+    print(f"   • Total columns: {len(columns)}")
+    print(f"   • Year range: {start_year} - {end_year}")
+    print(f"   • Districts: {districts:,}")
     print("\n✓ Database is ready for queries!")
     print("\nNext steps:")
     print("  1. Test NLP engine: python src/nlp_engine.py")
@@ -66,10 +191,12 @@ def import_data():
 
 if __name__ == "__main__":
     try:
-        import_data()
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(import_data())
     except Exception as e:
         print(f"\n❌ ERROR: {str(e)}")
         print("\nTroubleshooting:")
         print("  • Check that .env file exists with SUPABASE_DB_URL")
-        print("  • Verify data/texas_finance_clean.csv exists")
+        print("  • Verify data/texas_finance_clean.parquet or .csv exists")
         print("  • Ensure virtual environment is activated")
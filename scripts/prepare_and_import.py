@@ -0,0 +1,47 @@
+"""
+Prepare the Excel data and load it into Supabase in one pass
+Streams the cleaned DataFrame straight into COPY, with no intermediate files
+"""
+import asyncio
+import asyncpg
+import os
+from dotenv import load_dotenv
+
+from prepare_data import prepare_data
+from import_to_supabase import COPY_WORKERS, copy_frame, refresh_views
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
+# Load environment variables
+load_dotenv()
+
+async def prepare_and_import(input_file):
+    """Clean the Excel data in memory and COPY it to Supabase"""
+    db_url = os.getenv("SUPABASE_DB_URL")
+    if not db_url:
+        raise ValueError("SUPABASE_DB_URL not found in .env file")
+    
+    df = prepare_data(input_file)
+    
+    print(f"\n⏳ Importing {len(df):,} records to Supabase...")
+    pool = await asyncpg.create_pool(db_url, min_size=1, max_size=COPY_WORKERS)
+    try:
+        total_records = await copy_frame(pool, df)
+        
+        print("⏳ Refreshing materialized views...")
+        await refresh_views(pool)
+    finally:
+        await pool.close()
+    
+    print(f"\n✅ Imported {total_records:,} records")
+
+if __name__ == "__main__":
+    # Update this path to your Excel file location
+    input_file = "ETL_2008-2024-summarized-financial-data-03-17-2025.xlsx"
+    
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(prepare_and_import(input_file))
@@ -3,9 +3,24 @@ Data preparation script for Texas ISD financial data
 Cleans and transforms Excel data for Supabase import
 """
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pacsv
 import re
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 
+_NON_ALNUM = re.compile(r'[^0-9a-zA-Z]+')
+_UNDERSCORES = re.compile(r'_{2,}')
+_LINE_BREAKS = re.compile(r'\r\n|[\r\n]')
+
+# Declared types for the identifier columns, as named in the Excel sheet
+RAW_DTYPES = {"DISTRICT NUMBER": "string", "DISTRICT NAME": "string"}
+
+# Text columns with at most this ratio of unique values to rows become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
 def clean_district_number(x):
     """Clean district numbers - remove quotes, preserve leading zeros"""
     if pd.isna(x):
@@ -15,17 +30,62 @@ def clean_district_number(x):
         s = s.zfill(6)  # Ensure 6 digits with leading zeros
     return s
 
+@lru_cache(maxsize=4096)
 def to_snake_case(name):
     """Convert column names to snake_case"""
     s = name.strip().lower()
-    s = re.sub(r'[^0-9a-zA-Z]+', '_', s)
-    s = re.sub(r'_{2,}', '_', s).strip('_')
+    s = _NON_ALNUM.sub('_', s)
+    s = _UNDERSCORES.sub('_', s).strip('_')
     return s[:60]  # Postgres column limit
 
-def prepare_data(input_file, output_dir):
-    """Main data preparation function"""
+def save_outputs(df, output_dir):
+    """Write the cleaned CSV, Parquet copy and data dictionary"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    
+    # Convert to Arrow once; both writers run in C from the same table
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    
+    csv_path = output_dir / "texas_finance_clean.csv"
+    print(f"Saving cleaned data to {csv_path}...")
+    pacsv.write_csv(table, csv_path)
+    
+    parquet_path = output_dir / "texas_finance_clean.parquet"
+    print(f"Saving typed copy to {parquet_path}...")  # Keeps categorical encoding
+    pq.write_table(table, parquet_path, compression="zstd")
+    
+    # Generate data dictionary
+    print("Generating data dictionary...")
+    present = df.notna()
+    non_null = present.sum().to_numpy()
+    if len(df):
+        first_row = present.to_numpy().argmax(axis=0)  # First non-null row per column
+        samples = [df.iat[row, i] if non_null[i] else None for i, row in enumerate(first_row)]
+    else:
+        samples = [None] * len(df.columns)
+    data_dict = pd.DataFrame({
+        "column_name": df.columns,
+        "data_type": df.dtypes.astype(str).to_numpy(),
+        "sample_value": samples,
+        "non_null_count": non_null,
+        "null_count": len(df) - non_null
+    })
+    
+    dict_path = output_dir / "data_dictionary.csv"
+    data_dict.to_csv(dict_path, index=False)
+    
+    print(f"- Cleaned CSV: {csv_path}")
+    print(f"- Cleaned Parquet: {parquet_path}")
+    print(f"- Data dictionary: {dict_path}")
+
+def prepare_data(input_file, output_dir=None):
+    """
+    Main data preparation function
+    
+    Returns the cleaned DataFrame; files are written only when output_dir is given.
+    """
     print(f"Loading data from {input_file}...")
-    df = pd.read_excel(input_file, sheet_name="DATAMART")
+    df = pd.read_excel(input_file, sheet_name="DATAMART", dtype=RAW_DTYPES)
     
     # Clean district numbers
     print("Cleaning district numbers...")
@@ -33,19 +93,21 @@ def prepare_data(input_file, output_dir):
     
     # Rename columns to snake_case
     print("Converting column names to snake_case...")
-    col_mapping = {}
+    cleaned = [to_snake_case(str(col)) for col in df.columns]
+    
+    # Suffix duplicates in one pass: base, base_1, base_2, ...
+    suffixes = Counter()
     seen = set()
-    for col in df.columns:
-        base = to_snake_case(col)
+    names = []
+    for base in cleaned:
         candidate = base
-        i = 1
         while candidate in seen:
-            candidate = f"{base}_{i}"
-            i += 1
+            suffixes[base] += 1
+            candidate = f"{base}_{suffixes[base]}"
         seen.add(candidate)
-        col_mapping[col] = candidate
+        names.append(candidate)
     
-    df.rename(columns=col_mapping, inplace=True)
+    df.columns = names
     
     # Convert data types
     print("Converting data types...")
@@ -54,35 +116,36 @@ def prepare_data(input_file, output_dir):
             continue
         elif col == "year":
             df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int16")
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            continue  # Already typed by the Excel reader
         else:
             nums = pd.to_numeric(df[col], errors="coerce")
             if nums.notna().mean() >= 0.9:
                 df[col] = nums
+            elif df[col].dtype == object:
+                # Mixed numbers and text; Arrow needs a single type per column
+                df[col] = df[col].astype("string")
     
-    # Save outputs
-    output_dir = Path(output_dir)
-    output_dir.mkdir(exist_ok=True)
-    
-    csv_path = output_dir / "texas_finance_clean.csv"
-    print(f"Saving cleaned data to {csv_path}...")
-    df.to_csv(csv_path, index=False)
+    # Flatten line breaks inside text cells so every CSV record is one line;
+    # import_to_supabase.py splits the CSV for parallel COPY at line breaks
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].str.replace(_LINE_BREAKS, " ", regex=True)
     
-    # Generate data dictionary
-    print("Generating data dictionary...")
-    data_dict = pd.DataFrame({
-        "column_name": df.columns,
-        "data_type": [str(df[col].dtype) for col in df.columns],
-        "sample_value": [df[col].dropna().iloc[0] if df[col].notna().any() else None for col in df.columns],
-        "non_null_count": [df[col].notna().sum() for col in df.columns],
-        "null_count": [df[col].isna().sum() for col in df.columns]
-    })
+    # Store repetitive text as categoricals (codes plus a small dictionary)
+    print("Encoding low-cardinality text columns...")
+    df["district_name"] = df["district_name"].astype("category")
+    for col in df.columns:
+        if col in ("district_number", "district_name") or not isinstance(df[col].dtype, pd.StringDtype):
+            continue
+        if df[col].nunique() <= len(df) * CATEGORY_MAX_UNIQUE_RATIO:
+            df[col] = df[col].astype("category")
     
-    dict_path = output_dir / "data_dictionary.csv"
-    data_dict.to_csv(dict_path, index=False)
+    # Save outputs
+    if output_dir is not None:
+        save_outputs(df, output_dir)
     
     print(f"Data preparation complete!")
-    print(f"- Cleaned CSV: {csv_path}")
-    print(f"- Data dictionary: {dict_path}")
     print(f"- Total rows: {len(df):,}")
     print(f"- Total columns: {len(df.columns)}")
     
@@ -1,3 +1,6 @@
+-- Trigram matching for district name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create main finance table
 CREATE TABLE IF NOT EXISTS public.texas_school_finance (
     district_number TEXT NOT NULL,
@@ -35,7 +38,25 @@ CREATE INDEX IF NOT EXISTS idx_tex_fin_district ON public.texas_school_finance (
 CREATE INDEX IF NOT EXISTS idx_tex_fin_district_name ON public.texas_school_finance (district_name);
 
 -- Create summary view for public access
-CREATE OR REPLACE VIEW public.v_finance_summary AS
+-- Materialized so API reads hit indexes instead of re-expanding the view;
+-- refreshed by scripts/import_to_supabase.py after each import
+-- Replace the plain view from earlier versions of this script; CASCADE also
+-- drops v_anomaly_flags, which is recreated below
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname = 'v_finance_summary'
+          AND c.relkind = 'v'
+    ) THEN
+        DROP VIEW public.v_finance_summary CASCADE;
+    END IF;
+END $$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.v_finance_summary AS
 SELECT
     district_number,
     district_name,
@@ -58,6 +79,42 @@ SELECT
     all_funds_capital_projects_object_6600_for_td AS capital_projects
 FROM public.texas_school_finance;
 
+-- Create indexes on summary view
+-- The unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_finance_summary_district_year ON public.v_finance_summary (district_number, year);
+CREATE INDEX IF NOT EXISTS idx_finance_summary_year ON public.v_finance_summary (year);
+DROP INDEX IF EXISTS public.idx_finance_summary_district_name;
+-- Serves GET /districts?search=, whose ILIKE '%term%' has a leading wildcard
+CREATE INDEX IF NOT EXISTS idx_finance_summary_district_name_trgm ON public.v_finance_summary USING gin (district_name gin_trgm_ops);
+-- Matches the keyset pagination order of GET /districts (NULL names sort as '')
+DROP INDEX IF EXISTS public.idx_finance_summary_name_number;
+CREATE INDEX IF NOT EXISTS idx_finance_summary_name_key ON public.v_finance_summary ((COALESCE(district_name, '')), district_number);
+
+-- Create materialized view of year-over-year changes
+-- Precomputes the window functions so trend queries are an index lookup
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.v_finance_yoy AS
+SELECT
+    district_number,
+    district_name,
+    year,
+    total_revenue,
+    total_spend,
+    enrollment,
+    spend_per_student,
+    revenue_per_student,
+    -- Percent change from the district's previous year
+    ROUND((100 * (total_revenue - LAG(total_revenue) OVER w) / NULLIF(LAG(total_revenue) OVER w, 0))::numeric, 2) AS revenue_yoy_pct,
+    ROUND((100 * (total_spend - LAG(total_spend) OVER w) / NULLIF(LAG(total_spend) OVER w, 0))::numeric, 2) AS spend_yoy_pct,
+    ROUND((100.0 * (enrollment - LAG(enrollment) OVER w) / NULLIF(LAG(enrollment) OVER w, 0))::numeric, 2) AS enrollment_yoy_pct,
+    ROUND((100 * (spend_per_student - LAG(spend_per_student) OVER w) / NULLIF(LAG(spend_per_student) OVER w, 0))::numeric, 2) AS spend_per_student_yoy_pct,
+    ROUND((100 * (revenue_per_student - LAG(revenue_per_student) OVER w) / NULLIF(LAG(revenue_per_student) OVER w, 0))::numeric, 2) AS revenue_per_student_yoy_pct
+FROM v_finance_summary
+WINDOW w AS (PARTITION BY district_number ORDER BY year);
+
+-- Create index on year-over-year view
+-- The unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_finance_yoy_year_district ON public.v_finance_yoy (year, district_number);
+
 -- Create materialized view for anomaly detection
 CREATE MATERIALIZED VIEW IF NOT EXISTS public.v_anomaly_flags AS
 WITH finance_changes AS (
@@ -119,9 +176,14 @@ FROM finance_changes
 WHERE year > (SELECT MIN(year) FROM v_finance_summary); -- Exclude first year (no previous data)
 
 -- Create index on materialized view
+CREATE UNIQUE INDEX IF NOT EXISTS idx_anomaly_flags_district_year ON public.v_anomaly_flags (district_number, year);
 CREATE INDEX IF NOT EXISTS idx_anomaly_flags_district ON public.v_anomaly_flags (district_number);
 CREATE INDEX IF NOT EXISTS idx_anomaly_flags_year ON public.v_anomaly_flags (year);
+-- Matches the keyset pagination order of GET /anomalies (NULL names sort as '')
+DROP INDEX IF EXISTS public.idx_anomaly_flags_page;
+CREATE INDEX IF NOT EXISTS idx_anomaly_flags_page_key ON public.v_anomaly_flags (year DESC, (COALESCE(district_name, '')), district_number);
 
 -- Grant permissions
 GRANT SELECT ON public.v_finance_summary TO anon, authenticated;
+GRANT SELECT ON public.v_finance_yoy TO anon, authenticated;
 GRANT SELECT ON public.v_anomaly_flags TO anon, authenticated;
@@ -5,6 +5,8 @@ from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+import base64
+import json
 import os
 from dotenv import load_dotenv
 import asyncpg
@@ -63,13 +65,144 @@ class AnomalyFlag(BaseModel):
     per_student_spike_flag: bool
     enrollment_decline_flag: bool
 
+# Static SQL
+# Every request shape maps to one fixed query string, so asyncpg's per-connection
+# statement cache prepares each statement once and reuses it on later requests.
+
+# district_name is nullable; paging on it directly would skip NULL-name rows,
+# so sorts and keysets use this expression (indexed in sql/create_tables.sql)
+NAME_SORT_KEY = "COALESCE(district_name, '')"
+
+def _districts_sql(search: bool, paged: bool) -> str:
+    """Build the district list query for one combination of filters"""
+    conditions = []
+    param_count = 0
+    if search:
+        param_count += 1
+        conditions.append(f"district_name ILIKE ${param_count}")
+    if paged:
+        conditions.append(
+            f"({NAME_SORT_KEY}, district_number) > (${param_count + 1}, ${param_count + 2})"
+        )
+        param_count += 2
+    
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return (
+        f"SELECT DISTINCT ON ({NAME_SORT_KEY}, district_number) district_number, district_name"
+        + " FROM v_finance_summary" + where
+        + f" ORDER BY {NAME_SORT_KEY}, district_number LIMIT ${param_count + 1}"
+    )
+
+# Keyed by (has search, has cursor)
+DISTRICTS_SQL = {
+    (search, paged): _districts_sql(search, paged)
+    for search in (False, True)
+    for paged in (False, True)
+}
+
+# Keyed by (has start_year, has end_year)
+DISTRICT_SUMMARY_SQL = {
+    (False, False): "SELECT * FROM v_finance_summary WHERE district_number = $1 ORDER BY year",
+    (True, True): "SELECT * FROM v_finance_summary WHERE district_number = $1 AND year BETWEEN $2 AND $3 ORDER BY year",
+    (True, False): "SELECT * FROM v_finance_summary WHERE district_number = $1 AND year >= $2 ORDER BY year",
+    (False, True): "SELECT * FROM v_finance_summary WHERE district_number = $1 AND year <= $2 ORDER BY year",
+}
+
+ANOMALY_FLAG_COLUMNS = {
+    "revenue_drop": "revenue_drop_flag",
+    "spend_spike": "spend_spike_flag",
+    "per_student_spike": "per_student_spike_flag",
+    "enrollment_decline": "enrollment_decline_flag",
+}
+
+def _anomaly_sql(by_year: bool, flag_type: Optional[str], paged: bool) -> str:
+    """Build the anomalies query for one combination of filters"""
+    conditions = []
+    param_count = 0
+    if by_year:
+        param_count += 1
+        conditions.append(f"year = ${param_count}")
+    if flag_type:
+        param_count += 1
+        conditions.append(f"{ANOMALY_FLAG_COLUMNS[flag_type]} = ${param_count}")
+    
+    # If no conditions, get all anomalies
+    if not conditions:
+        conditions.append("(" + " OR ".join(ANOMALY_FLAG_COLUMNS.values()) + ")")
+    
+    # Keyset continuation for ORDER BY year DESC, name sort key, district_number
+    if paged:
+        year_param, name_param, number_param = (f"${param_count + i}" for i in (1, 2, 3))
+        conditions.append(
+            f"(year < {year_param} OR (year = {year_param} AND "
+            f"({NAME_SORT_KEY}, district_number) > ({name_param}, {number_param})))"
+        )
+        param_count += 3
+    
+    return (
+        "SELECT * FROM v_anomaly_flags WHERE " + " AND ".join(conditions)
+        + f" ORDER BY year DESC, {NAME_SORT_KEY}, district_number LIMIT ${param_count + 1}"
+    )
+
+# Keyed by (has year, flag_type or None, has cursor)
+ANOMALY_SQL = {
+    (by_year, flag_type, paged): _anomaly_sql(by_year, flag_type, paged)
+    for by_year in (False, True)
+    for flag_type in (None, *ANOMALY_FLAG_COLUMNS)
+    for paged in (False, True)
+}
+
+STATS_SQL = """
+    SELECT 
+        COUNT(DISTINCT district_number) as total_districts,
+        COUNT(DISTINCT year) as total_years,
+        MIN(year) as start_year,
+        MAX(year) as end_year,
+        COUNT(*) as total_records,
+        ROUND(AVG(spend_per_student)::numeric, 2) as avg_spend_per_student
+    FROM v_finance_summary
+"""
+
+# Keyset pagination
+def _encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last returned row as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor: str, types: tuple) -> List[Any]:
+    """Decode a cursor into its sort key, checking it has the expected shape"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(isinstance(v, t) for v, t in zip(values, types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def _page(rows: List[asyncpg.Record], limit: int, key_columns: List[str]) -> Dict[str, Any]:
+    """Trim a limit + 1 fetch to one page and build the cursor for the next"""
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        # NULL names are keyed as '' to match NAME_SORT_KEY
+        last = items[-1]
+        next_cursor = _encode_cursor(["" if last[col] is None else last[col] for col in key_columns])
+    return {"items": items, "next_cursor": next_cursor}
+
 # Database connection pool
 async def get_db_pool():
     """Create connection pool for direct queries"""
     return await asyncpg.create_pool(
         os.getenv("SUPABASE_DB_URL"),
-        min_size=1,
-        max_size=10
+        min_size=10,
+        max_size=50,
+        max_inactive_connection_lifetime=300,
+        max_queries=50000,
+        statement_cache_size=1024,
+        command_timeout=60
     )
 
 # Initialize pool on startup
@@ -114,29 +247,20 @@ async def nlp_query(request: NLPQueryRequest):
 @app.get("/districts", tags=["Districts"])
 async def list_districts(
     search: Optional[str] = Query(None, description="Search districts by name"),
-    limit: int = Query(100, ge=1, le=500)
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
-    """List all districts with optional search"""
+    """List all districts with optional search, one page at a time"""
+    params = []
+    if search:
+        params.append(f"%{search}%")
+    if cursor:
+        params.extend(_decode_cursor(cursor, (str, str)))
+    params.append(limit + 1)  # One extra row tells us whether another page exists
+    
     async with app.state.db_pool.acquire() as conn:
-        if search:
-            query = """
-                SELECT DISTINCT district_number, district_name 
-                FROM v_finance_summary 
-                WHERE district_name ILIKE $1
-                ORDER BY district_name 
-                LIMIT $2
-            """
-            rows = await conn.fetch(query, f"%{search}%", limit)
-        else:
-            query = """
-                SELECT DISTINCT district_number, district_name 
-                FROM v_finance_summary 
-                ORDER BY district_name 
-                LIMIT $1
-            """
-            rows = await conn.fetch(query, limit)
-        
-        return [dict(row) for row in rows]
+        rows = await conn.fetch(DISTRICTS_SQL[(bool(search), bool(cursor))], *params)
+        return _page(rows, limit, ["district_name", "district_number"])
 
 @app.get("/district/{district_number}/summary", tags=["Districts"])
 async def get_district_summary(
@@ -146,23 +270,9 @@ async def get_district_summary(
 ):
     """Get financial summary for a specific district"""
     async with app.state.db_pool.acquire() as conn:
-        query = """
-            SELECT * FROM v_finance_summary 
-            WHERE district_number = $1
-        """
+        query = DISTRICT_SUMMARY_SQL[(start_year is not None, end_year is not None)]
         params = [district_number]
-        
-        if start_year and end_year:
-            query += " AND year BETWEEN $2 AND $3"
-            params.extend([start_year, end_year])
-        elif start_year:
-            query += " AND year >= $2"
-            params.append(start_year)
-        elif end_year:
-            query += " AND year <= $2"
-            params.append(end_year)
-            
-        query += " ORDER BY year"
+        params.extend(y for y in (start_year, end_year) if y is not None)
         
         rows = await conn.fetch(query, *params)
         
@@ -179,37 +289,27 @@ async def get_anomalies(
         description="Filter by flag type",
         enum=["revenue_drop", "spend_spike", "per_student_spike", "enrollment_decline"]
     ),
-    limit: int = Query(100, ge=1, le=500)
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
-    """Get districts with anomaly flags"""
+    """Get districts with anomaly flags, one page at a time"""
+    flag_type = flag_type or None  # An empty value means no flag filter
+    if flag_type and flag_type not in ANOMALY_FLAG_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown flag_type: {flag_type}")
+    
+    params = []
+    if year is not None:
+        params.append(year)
+    if flag_type:
+        params.append(True)
+    if cursor:
+        params.extend(_decode_cursor(cursor, (int, str, str)))
+    params.append(limit + 1)  # One extra row tells us whether another page exists
+    
     async with app.state.db_pool.acquire() as conn:
-        query = "SELECT * FROM v_anomaly_flags WHERE "
-        conditions = []
-        params = []
-        param_count = 0
-        
-        # Build dynamic WHERE clause
-        if year:
-            param_count += 1
-            conditions.append(f"year = ${param_count}")
-            params.append(year)
-        
-        if flag_type:
-            param_count += 1
-            flag_column = f"{flag_type}_flag"
-            conditions.append(f"{flag_column} = ${param_count}")
-            params.append(True)
-        
-        # If no conditions, get all anomalies
-        if not conditions:
-            conditions.append("(revenue_drop_flag OR spend_spike_flag OR per_student_spike_flag OR enrollment_decline_flag)")
-        
-        query += " AND ".join(conditions)
-        query += f" ORDER BY year DESC, district_name LIMIT ${param_count + 1}"
-        params.append(limit)
-        
+        query = ANOMALY_SQL[(year is not None, flag_type, bool(cursor))]
         rows = await conn.fetch(query, *params)
-        return [dict(row) for row in rows]
+        return _page(rows, limit, ["year", "district_name", "district_number"])
 
 @app.get("/sample-queries", tags=["NLP"])
 async def get_sample_queries():
@@ -223,16 +323,7 @@ async def get_sample_queries():
 async def get_stats():
     """Get database statistics"""
     async with app.state.db_pool.acquire() as conn:
-        stats = await conn.fetchrow("""
-            SELECT 
-                COUNT(DISTINCT district_number) as total_districts,
-                COUNT(DISTINCT year) as total_years,
-                MIN(year) as start_year,
-                MAX(year) as end_year,
-                COUNT(*) as total_records,
-                ROUND(AVG(spend_per_student)::numeric, 2) as avg_spend_per_student
-            FROM v_finance_summary
-        """)
+        stats = await conn.fetchrow(STATS_SQL)
         
         return dict(stats)
 
@@ -2,8 +2,12 @@
 NLP Query Engine using LangChain for natural language to SQL conversion
 """
 import os
-from typing import Dict, Any
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
+from langchain.globals import set_llm_cache
+from langchain_community.cache import InMemoryCache
 from langchain_community.utilities import SQLDatabase
 from langchain.agents import create_sql_agent
 from langchain_openai import ChatOpenAI
@@ -12,6 +16,34 @@ from langchain.agents.agent_toolkits import SQLDatabaseToolkit
 
 load_dotenv()
 
+# Seconds before cached answers expire, so refreshed views show up without a restart
+ANSWER_CACHE_TTL = 3600
+# Most cached answers kept before the least recently used is evicted
+ANSWER_CACHE_SIZE = 1024
+
+class CachedSchemaSQLDatabase(SQLDatabase):
+    """SQLDatabase that introspects each set of tables only once per process"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._table_info_cache: Dict[Any, str] = {}
+    
+    def get_table_info(
+        self, table_names: Optional[List[str]] = None, get_col_comments: bool = False
+    ) -> str:
+        key = (tuple(sorted(table_names)) if table_names else None, get_col_comments)
+        if key not in self._table_info_cache:
+            if get_col_comments:
+                info = super().get_table_info(table_names, get_col_comments=True)
+            else:
+                info = super().get_table_info(table_names)
+            self._table_info_cache[key] = info
+        return self._table_info_cache[key]
+    
+    def clear_table_info_cache(self):
+        """Forget cached schema so the next call re-introspects"""
+        self._table_info_cache.clear()
+
 class TexasFinanceNLPEngine:
     """Natural language query engine for Texas school finance data"""
     
@@ -21,12 +53,29 @@ class TexasFinanceNLPEngine:
         if not db_url:
             raise ValueError("SUPABASE_DB_URL not found in environment variables")
         
-        # Connect to specific views only (for safety)
-        self.db = SQLDatabase.from_uri(
+        # Connect to specific views only (for safety); they are materialized
+        # views, so view reflection must be enabled for include_tables to find them
+        # Health-checked pool capped at 10 connections (no overflow), recycled
+        # on the same 300s cycle as the API pool's idle connections
+        self.db = CachedSchemaSQLDatabase.from_uri(
             db_url, 
-            include_tables=["v_finance_summary", "v_anomaly_flags"]
+            include_tables=["v_finance_summary", "v_finance_yoy", "v_anomaly_flags"],
+            view_support=True,
+            engine_args={
+                "pool_pre_ping": True,
+                "pool_size": 10,
+                "max_overflow": 0,
+                "pool_recycle": 300
+            }
         )
         
+        # Warm the schema cache up front; the schema is static between deploys
+        self.db.get_table_info()
+        
+        # Cache LLM calls, including the intermediate ones the agent makes
+        self._llm_cache = InMemoryCache()
+        set_llm_cache(self._llm_cache)
+        
         # Initialize LLM
         self.llm = ChatOpenAI(
             model="gpt-4o-mini", 
@@ -54,7 +103,14 @@ Available views:
    - debt_service (debt service payments)
    - capital_projects (capital project spending)
 
-2. v_anomaly_flags - Detected financial anomalies with columns:
+2. v_finance_yoy - Precomputed year-over-year changes with columns:
+   - district_number, district_name, year
+   - total_revenue, total_spend, enrollment, spend_per_student, revenue_per_student
+   - revenue_yoy_pct, spend_yoy_pct, enrollment_yoy_pct,
+     spend_per_student_yoy_pct, revenue_per_student_yoy_pct
+     (percent change from the district's previous year; NULL for its first year)
+
+3. v_anomaly_flags - Detected financial anomalies with columns:
    - All columns from v_finance_summary plus:
    - revenue_drop_flag (true if revenue dropped >15% YoY)
    - spend_spike_flag (true if spending increased >20% with flat enrollment)
@@ -68,19 +124,47 @@ Rules:
 - Round financial figures to 2 decimal places for readability
 - When asked about "spending", use total_spend unless specified otherwise
 - For year ranges, use BETWEEN operator
+- For year-over-year changes, select the *_yoy_pct columns from v_finance_yoy instead of computing LAG or other window functions
 
-Be concise and clear in your responses. If asked for trends, calculate year-over-year changes."""
+Be concise and clear in your responses. If asked for trends, report year-over-year changes from v_finance_yoy."""
 
         # Create agent
         self.agent = create_sql_agent(
             llm=self.llm,
             toolkit=toolkit,
             agent_type=AgentType.OPENAI_FUNCTIONS,
-            verbose=True,  # Set to False in production
+            verbose=False,
             prefix=self.system_prefix,
             max_iterations=5,
             early_stopping_method="generate"
         )
+        
+        # Cache final answers per normalized question, least recently used first
+        self._answers: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_started = time.monotonic()
+    
+    def clear_cache(self):
+        """Drop cached answers, LLM calls and schema, e.g. after the views are refreshed"""
+        self._answers.clear()
+        self._llm_cache.clear()
+        self.db.clear_table_info_cache()
+        self._cache_started = time.monotonic()
+    
+    @staticmethod
+    def _normalize(question: str) -> str:
+        """Collapse whitespace and case so equivalent questions share a cache entry"""
+        return " ".join(question.split()).lower()
+    
+    def _answer(self, question: str) -> str:
+        """Run the agent for a question and return its output"""
+        # Add safety constraints to the question
+        safe_question = f"{question}\nPlease limit results to 100 rows maximum."
+        
+        # Execute query
+        result = self.agent.invoke({"input": safe_question})
+        
+        # Extract the output
+        return result.get("output", "No result returned")
     
     def query(self, question: str) -> Dict[str, Any]:
         """
@@ -93,14 +177,21 @@ Be concise and clear in your responses. If asked for trends, calculate year-over
             Dict with 'answer' and optionally 'data' keys
         """
         try:
-            # Add safety constraints to the question
-            safe_question = f"{question}\nPlease limit results to 100 rows maximum."
-            
-            # Execute query
-            result = self.agent.invoke({"input": safe_question})
+            # Expire cached answers wholesale once they are older than the TTL
+            if time.monotonic() - self._cache_started > ANSWER_CACHE_TTL:
+                self.clear_cache()
             
-            # Extract the output
-            output = result.get("output", "No result returned")
+            # The agent sees the question as asked; only the cache key is normalized.
+            # Failed runs raise, so only successful answers are cached.
+            key = self._normalize(question)
+            if key in self._answers:
+                self._answers.move_to_end(key)
+                output = self._answers[key]
+            else:
+                output = self._answer(question)
+                self._answers[key] = output
+                if len(self._answers) > ANSWER_CACHE_SIZE:
+                    self._answers.popitem(last=False)
             
             return {
                 "success": True,
@@ -2,12 +2,26 @@
 Sample visualization functions for Texas School Finance data
 """
 import matplotlib.pyplot as plt
+from matplotlib.ticker import StrMethodFormatter
 import seaborn as sns
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from typing import List, Dict, Any
 
+# Shared formatters and layouts, built once at import
+_CURRENCY_FMT = StrMethodFormatter('${x:,.0f}')
+
+_TREND_LAYOUT = dict(
+    hovermode='x unified',
+    legend=dict(
+        yanchor="top",
+        y=0.99,
+        xanchor="left",
+        x=0.01
+    )
+)
+
 def plot_district_trend(data: List[Dict[str, Any]], district_name: str, metric: str = "spend_per_student"):
     """
     Create a line plot showing trend over time for a district
@@ -29,7 +43,7 @@ def plot_district_trend(data: List[Dict[str, Any]], district_name: str, metric:
     # Format y-axis for currency
     if 'spend' in metric or 'revenue' in metric:
         ax = plt.gca()
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+        ax.yaxis.set_major_formatter(_CURRENCY_FMT)
     
     plt.tight_layout()
     return plt
@@ -55,7 +69,7 @@ def plot_district_comparison(data: List[Dict[str, Any]], metric: str = "spend_pe
     # Format x-axis for currency
     if 'spend' in metric or 'revenue' in metric:
         ax = plt.gca()
-        ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+        ax.xaxis.set_major_formatter(_CURRENCY_FMT)
     
     plt.tight_layout()
     return plt
@@ -81,15 +95,7 @@ def create_interactive_trend(data: List[Dict[str, Any]], districts: List[str], m
                   })
     
     # Update layout
-    fig.update_layout(
-        hovermode='x unified',
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01
-        )
-    )
+    fig.update_layout(**_TREND_LAYOUT)
     
     # Format y-axis for currency
     if 'spend' in metric or 'revenue' in metric:
@@ -108,23 +114,28 @@ def create_anomaly_heatmap(anomaly_data: List[Dict[str, Any]]):
     
     # Create a binary matrix of anomalies
     anomaly_cols = ['revenue_drop_flag', 'spend_spike_flag', 'per_student_spike_flag', 'enrollment_decline_flag']
+    anomaly_cols = [col for col in anomaly_cols if col in df.columns]
     
-    # Pivot data to create matrix
-    pivot_data = []
-    for _, row in df.iterrows():
-        for col in anomaly_cols:
-            if row.get(col, False):
-                pivot_data.append({
-                    'district': row['district_name'],
-                    'year': row['year'],
-                    'anomaly_type': col.replace('_flag', '').replace('_', ' ').title(),
-                    'value': 1
-                })
-    
-    if not pivot_data:
+    if df.empty:
         return None
     
-    pivot_df = pd.DataFrame(pivot_data)
+    # Reshape to one row per (district, year, anomaly) and keep the raised flags
+    pivot_df = df[['district_name', 'year'] + anomaly_cols].melt(
+        id_vars=['district_name', 'year'],
+        value_vars=anomaly_cols,
+        var_name='anomaly_type',
+        value_name='value'
+    )
+    pivot_df = pivot_df[pivot_df['value'].fillna(False).astype(bool)]
+    
+    if pivot_df.empty:
+        return None
+    
+    pivot_df = pivot_df.rename(columns={'district_name': 'district'})
+    pivot_df['anomaly_type'] = (
+        pivot_df['anomaly_type'].str.replace('_flag', '').str.replace('_', ' ').str.title()
+    )
+    pivot_df['value'] = 1
     matrix = pivot_df.pivot_table(index='district', columns=['year', 'anomaly_type'], 
                                    values='value', fill_value=0)
     
@@ -154,27 +165,30 @@ def create_enrollment_vs_spending_scatter(data: List[Dict[str, Any]], year: int)
     df = df.dropna(subset=['enrollment', 'spend_per_student'])
     df = df[(df['enrollment'] > 0) & (df['spend_per_student'] > 0)]
     
-    fig = px.scatter(df, 
-                     x='enrollment', 
-                     y='spend_per_student',
-                     hover_data=['district_name'],
-                     title=f'Enrollment vs Spending per Student ({year})',
-                     labels={
-                         'enrollment': 'Student Enrollment',
-                         'spend_per_student': 'Spending per Student ($)'
-                     })
+    # WebGL traces keep interaction smooth at thousands of points
+    fig = go.Figure(
+        go.Scattergl(x=df['enrollment'],
+                     y=df['spend_per_student'],
+                     mode='markers',
+                     name='Districts',
+                     text=df['district_name'],
+                     hovertemplate='%{text}<br>Enrollment: %{x:,}<br>Spending: $%{y:,.0f}<extra></extra>')
+    )
     
     # Add trendline
     fig.add_trace(
-        go.Scatter(x=df['enrollment'], 
-                   y=df['spend_per_student'].rolling(window=5).mean().sort_values(),
-                   mode='lines',
-                   name='Trend',
-                   line=dict(color='red', dash='dash'))
+        go.Scattergl(x=df['enrollment'], 
+                     y=df['spend_per_student'].rolling(window=5).mean().sort_values(),
+                     mode='lines',
+                     name='Trend',
+                     line=dict(color='red', dash='dash'))
     )
     
-    fig.update_xaxis(type='log', title='Student Enrollment (log scale)')
-    fig.update_yaxis(tickformat='$,.0f')
+    fig.update_layout(
+        title=f'Enrollment vs Spending per Student ({year})',
+        xaxis=dict(type='log', title='Student Enrollment (log scale)'),
+        yaxis=dict(title='Spending per Student ($)', tickformat='$,.0f')
+    )
     
     return fig
 